@@ -1,3 +1,5 @@
+import hashlib
+import io
 import os
 from pathlib import Path
 import chromadb
@@ -8,21 +10,41 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from tqdm import tqdm
 from dotenv import load_dotenv
 import PyPDF2
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
 from pptx import Presentation
 import re
+import threading
 
 # Load environment variables
 load_dotenv()
 
+# Embeddings depend only on the text, so one cache serves every assistant in the
+# process. Each vector is ~1,536 floats (~50 KB as a list), hence the cap;
+# the oldest entries are dropped first.
+EMBEDDING_CACHE_SIZE = 2000
+_embedding_cache = {}
+_embedding_cache_lock = threading.Lock()
+
+def _document_key(source, content):
+    """Short digest of a document's name and text. Chunk ids start with it, so
+    files that share a stem never share ids and an edited file gets new ones."""
+    return hashlib.blake2b(f"{source}\0{content}".encode("utf-8"), digest_size=8).hexdigest()
+
 
 class AIStudyAssistant:
-    def __init__(self, persist_directory="db"):
-        """Initialize the AI Study Assistant with a ChromaDB instance."""
-        self.client = chromadb.PersistentClient(path=persist_directory)
-        self.collection = self.client.get_or_create_collection(
-            name="lecture_content",
-            metadata={"hnsw:space": "cosine"}
-        )
+    def __init__(self, persist_directory="db", client=None, collection_name="lecture_content"):
+        """Initialize the AI Study Assistant; the ChromaDB instance is opened on first use.
+        Pass a client to share one ChromaDB store between assistants, each on its own collection."""
+        self.persist_directory = persist_directory
+        self.client = client
+        self.collection_name = collection_name
+        self._collection = None
+        self._collection_lock = threading.Lock()
+        # Uploads embed on several threads at once; writes to the store go one at a time
+        self._write_lock = threading.Lock()
 
         # Configure API key if present; UI may set it later at runtime.
         env_key = os.getenv("OPENAI_API_KEY")
@@ -35,8 +57,25 @@ class AIStudyAssistant:
             length_function=len,
         )
         self.GEN_MODEL = os.getenv("GEN_MODEL", "gpt-4o-mini")
-        # Embedding cache for performance (text hash -> embedding vector)
-        self._embedding_cache = {}
+        # Embedding cache for performance (text digest -> embedding vector), shared process-wide
+        self._embedding_cache = _embedding_cache
+        # Optional reader of a PDF's bytes into per-page texts, e.g. one that
+        # spreads the pages over a process pool; used in place of PyMuPDF here
+        self.pdf_pages = None
+
+    @property
+    def collection(self):
+        """The assistant's collection, opening the ChromaDB client on first access."""
+        if self._collection is None:
+            with self._collection_lock:
+                if self._collection is None:
+                    if self.client is None:
+                        self.client = chromadb.PersistentClient(path=self.persist_directory)
+                    self._collection = self.client.get_or_create_collection(
+                        name=self.collection_name,
+                        metadata={"hnsw:space": "cosine"}
+                    )
+        return self._collection
 
     def get_embeddings_batch(self, texts, use_cache=True):
         """Batch embedding with optional caching to avoid redundant API calls."""
@@ -47,17 +86,22 @@ class AIStudyAssistant:
             return [d["embedding"] for d in resp["data"]]
         
         # Check cache and only embed uncached texts
+        # Keys only need to tell chunks apart within this process, so a short BLAKE2b
+        # digest is enough, and each text is hashed once
         results = [None] * len(texts)
         texts_to_embed = []
         indices_to_embed = []
+        hashes_to_embed = []
         
         for i, text in enumerate(texts):
-            text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
-            if text_hash in self._embedding_cache:
-                results[i] = self._embedding_cache[text_hash]
+            text_hash = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+            cached = self._embedding_cache.get(text_hash)
+            if cached is not None:
+                results[i] = cached
             else:
                 texts_to_embed.append(text)
                 indices_to_embed.append(i)
+                hashes_to_embed.append(text_hash)
         
         # Embed uncached texts
         if texts_to_embed:
@@ -65,10 +109,12 @@ class AIStudyAssistant:
             embeddings = [d["embedding"] for d in resp["data"]]
             
             # Cache and populate results
-            for idx, text, emb in zip(indices_to_embed, texts_to_embed, embeddings):
-                text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
-                self._embedding_cache[text_hash] = emb
-                results[idx] = emb
+            with _embedding_cache_lock:
+                for idx, text_hash, emb in zip(indices_to_embed, hashes_to_embed, embeddings):
+                    self._embedding_cache[text_hash] = emb
+                    results[idx] = emb
+                while len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+                    del self._embedding_cache[next(iter(self._embedding_cache))]
         
         return results
 
@@ -77,8 +123,9 @@ class AIStudyAssistant:
         resp = openai.Embedding.create(model="text-embedding-3-small", input=text)
         return resp["data"][0]["embedding"]
 
-    def extract_pptx_content(self, pptx_path: str, original_filename: str | None = None):
+    def extract_pptx_content(self, pptx_path, original_filename: str | None = None):
         """Extract text content from PowerPoint file with slide numbers.
+        pptx_path may be a path or a binary file-like object (then original_filename is required).
         original_filename overrides the tmp path name for user display.
         """
         prs = Presentation(pptx_path)
@@ -86,77 +133,112 @@ class AIStudyAssistant:
         display_name = original_filename or Path(pptx_path).name
         
         for slide_num, slide in enumerate(prs.slides, start=1):
-            slide_text = f"\n--- Slide {slide_num} ---\n"
+            parts = [f"\n--- Slide {slide_num} ---\n"]
             
             # Extract text from all shapes
             for shape in slide.shapes:
                 if hasattr(shape, "text") and shape.text.strip():
-                    slide_text += shape.text + "\n"
+                    parts.append(shape.text + "\n")
             
             # Extract notes
             if slide.has_notes_slide:
                 notes_text = slide.notes_slide.notes_text_frame.text
                 if notes_text.strip():
-                    slide_text += f"\nNotes: {notes_text}\n"
+                    parts.append(f"\nNotes: {notes_text}\n")
             
             slides_content.append({
                 'slide_number': slide_num,
-                'content': slide_text,
+                'content': "".join(parts),
                 'filename': display_name
             })
         
         return slides_content
 
-    def process_pptx(self, pptx_path: str, original_filename: str | None = None):
-        """Process PowerPoint file and add to vector database with slide tracking."""
+    def process_pptx(self, pptx_path, original_filename: str | None = None):
+        """Process PowerPoint file and add to vector database with slide tracking.
+        pptx_path may be a path or an in-memory binary stream (then original_filename is required).
+        """
+        display_name = original_filename or Path(pptx_path).name
+        self._store_chunks(*self.pptx_chunks(pptx_path, original_filename=original_filename), desc=f"Processing {display_name}")
+
+    def pptx_chunks(self, pptx_path, original_filename: str | None = None):
+        """Slides of a PowerPoint file as (documents, ids, metadatas), ready for bulk_add."""
         slides = self.extract_pptx_content(pptx_path, original_filename=original_filename)
-        
-        # Batch slides to reduce API calls
-        BATCH_SIZE = 24
-        for start in tqdm(range(0, len(slides), BATCH_SIZE), desc=f"Processing {Path(pptx_path).name}"):
-            batch = slides[start:start + BATCH_SIZE]
-            batch_texts = [s['content'] for s in batch]
-            embeddings = self.get_embeddings_batch(batch_texts)
-            ids = [f"{Path(pptx_path).stem}_slide_{s['slide_number']}" for s in batch]
-            metadatas = [{
-                "source": pptx_path,
-                "slide_number": s['slide_number'],
-                "filename": s['filename'],  # use original display name if provided
-                "type": "slide"
-            } for s in batch]
-
-            self.collection.add(
-                documents=batch_texts,
-                embeddings=embeddings,
-                ids=ids,
-                metadatas=metadatas,
-            )
+        source = str(pptx_path) if isinstance(pptx_path, (str, os.PathLike)) else original_filename
+        documents = [s['content'] for s in slides]
+        key = _document_key(source, "".join(documents))
+        ids = [f"{key}_slide_{s['slide_number']}" for s in slides]
+        metadatas = [{
+            "source": source,
+            "slide_number": s['slide_number'],
+            "filename": s['filename'],  # use original display name if provided
+            "type": "slide"
+        } for s in slides]
+        return documents, ids, metadatas
+
+    def extract_pdf_content(self, pdf_path):
+        """Extract text content from PDF (a path, raw bytes, or a binary file-like object).
+        Uses PyMuPDF when installed, which opens bytes in place without a temp file,
+        and falls back to PyPDF2 if it is missing or cannot parse the file."""
+        if fitz is not None:
+            if not isinstance(pdf_path, (str, os.PathLike, bytes, bytearray, memoryview)):
+                pdf_path = pdf_path.read()
+            try:
+                if self.pdf_pages is not None:
+                    if isinstance(pdf_path, (str, os.PathLike)):
+                        data = Path(pdf_path).read_bytes()
+                    else:
+                        data = bytes(pdf_path)
+                    return "".join(self.pdf_pages(data))
+                if isinstance(pdf_path, (str, os.PathLike)):
+                    doc = fitz.open(pdf_path)
+                else:
+                    doc = fitz.open(stream=bytes(pdf_path), filetype="pdf")
+                with doc:
+                    return "".join(page.get_text("text") for page in doc)
+            except Exception:
+                pass  # malformed for MuPDF; PyPDF2 is more lenient with some files
+        if isinstance(pdf_path, (bytes, bytearray, memoryview)):
+            pdf_path = io.BytesIO(pdf_path)
+        pdf_reader = PyPDF2.PdfReader(pdf_path)
+        return "".join(page.extract_text() for page in pdf_reader.pages)
+
+    def read_test_content(self, test_path, file_type: str | None = None):
+        """Return the text of a practice test.
 
-    def extract_pdf_content(self, pdf_path: str):
-        """Extract text content from PDF."""
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-        return text
+        Args:
+            test_path: Path to the test file, or the file's raw bytes
+            file_type: Extension (".pdf" or ".pptx") used when test_path is bytes; defaults to ".pdf"
+        """
+        if isinstance(test_path, (bytes, bytearray, memoryview)):
+            ext = (file_type or ".pdf").lower()
+            # PDFs are read straight from the bytes; python-pptx needs a stream
+            source = test_path if ext == ".pdf" else io.BytesIO(test_path)
+            display_name = f"practice_test{ext}"
+        else:
+            ext = Path(test_path).suffix.lower()
+            source = test_path
+            display_name = None
+
+        if ext == ".pdf":
+            return self.extract_pdf_content(source)
+        elif ext == ".pptx":
+            # Treat each slide as potential question/context block
+            slides = self.extract_pptx_content(source, original_filename=display_name)
+            return "\n".join([s["content"] for s in slides])
+        else:
+            raise ValueError(f"Unsupported practice test file type: {ext}")
     
-    def extract_questions_and_answers(self, test_path: str):
+    def extract_questions_and_answers(self, test_path, file_type: str | None = None):
         """Extract questions, correct answers, and user's answers from a practice test.
+        test_path may be a path or the test's raw bytes (see read_test_content).
         
         Returns:
             dict with 'questions' (dict of q_num -> question_text),
             'correct_answers' (dict of q_num -> answer),
             'user_answers' (dict of q_num -> answer if found)
         """
-        ext = Path(test_path).suffix.lower()
-        if ext == ".pdf":
-            test_content = self.extract_pdf_content(test_path)
-        elif ext == ".pptx":
-            slides = self.extract_pptx_content(test_path)
-            test_content = "\n".join([s["content"] for s in slides])
-        else:
-            raise ValueError(f"Unsupported file type: {ext}")
+        test_content = self.read_test_content(test_path, file_type)
         
         extraction_prompt = f"""Extract all questions, correct answers, AND the user's answers from this practice test.
 
@@ -226,25 +308,18 @@ IMPORTANT Instructions:
             # Fallback if parsing fails
             return {"questions": {}, "correct_answers": {}, "user_answers": {}}
 
-    def analyze_practice_test(self, test_path: str, flagged_questions: list = None):
+    def analyze_practice_test(self, test_path, flagged_questions: list = None, file_type: str | None = None):
         """Analyze practice test (PDF or PPTX) and identify topics to review.
 
         Args:
-            test_path: Path to the practice test file (.pdf or .pptx)
+            test_path: Path to the practice test file (.pdf or .pptx), or its raw bytes
             flagged_questions: Optional list of question numbers to emphasize
+            file_type: Extension of the test when test_path is bytes
 
         Returns:
             dict with keys: test_analysis (str), test_content (str)
         """
-        ext = Path(test_path).suffix.lower()
-        if ext == ".pdf":
-            test_content = self.extract_pdf_content(test_path)
-        elif ext == ".pptx":
-            # Treat each slide as potential question/context block
-            slides = self.extract_pptx_content(test_path)
-            test_content = "\n".join([s["content"] for s in slides])
-        else:
-            raise ValueError(f"Unsupported practice test file type: {ext}")
+        test_content = self.read_test_content(test_path, file_type)
 
         flagged_clause = (
             f"Focus on these question numbers: {', '.join(map(str, flagged_questions))}" if flagged_questions else "Analyze all questions"
@@ -312,24 +387,28 @@ Format as a structured list with clear question-by-question breakdown."""
         
         return slides_by_file
 
-    def create_targeted_study_guide(self, test_path: str, flagged_questions: list = None, fast_mode: bool = False):
+    def create_targeted_study_guide(self, test_path, flagged_questions: list = None, fast_mode: bool = False,
+                                    file_type: str | None = None, questions_data: dict | None = None):
         """
         Create a personalized study guide based on practice test performance.
         
         Args:
-            test_path: Path to practice test file (.pdf or .pptx)
+            test_path: Path to practice test file (.pdf or .pptx), or its raw bytes
             flagged_questions: List of question numbers to focus on (wrong/flagged)
             fast_mode: If True, use lighter processing for faster results
+            file_type: Extension of the test when test_path is bytes
+            questions_data: Result of extract_questions_and_answers, if the caller already has it
         
         Returns:
             Dictionary with study guide and slide recommendations
         """
         print("📝 Analyzing practice test...")
         # Analyze the practice test
-        test_analysis = self.analyze_practice_test(test_path, flagged_questions)
+        test_analysis = self.analyze_practice_test(test_path, flagged_questions, file_type)
 
-        # Extract questions for explicit mapping
-        questions_data = self.extract_questions_and_answers(test_path)
+        # Extract questions for explicit mapping (skip the LLM call if the caller already did it)
+        if questions_data is None:
+            questions_data = self.extract_questions_and_answers(test_path, file_type)
         questions = questions_data.get('questions', {})
         
         # VALIDATION: Ensure all questions extracted
@@ -450,7 +529,7 @@ Be medically accurate and thorough."""
                 - dict of filename -> list of slides (old format)
                 - dict of question_num -> dict of filename -> list of slides (new format)
         """
-        formatted = ""
+        parts = []
         count = 0
         
         # Check if this is the new nested format (question -> filename -> slides)
@@ -469,14 +548,14 @@ Be medically accurate and thorough."""
         for filename, slides in slides_by_file.items():
             if count >= max_slides:
                 break
-            formatted += f"\n\nFrom {filename}:\n"
+            parts.append(f"\n\nFrom {filename}:\n")
             for slide in slides[:max_slides]:
                 if count >= max_slides:
                     break
-                formatted += f"\nSlide {slide['slide_number']}:\n{slide['content'][:500]}...\n"
+                parts.append(f"\nSlide {slide['slide_number']}:\n{slide['content'][:500]}...\n")
                 count += 1
         
-        return formatted
+        return "".join(parts)
 
     def process_transcription(self, file_path, original_filename: str | None = None):
         """Process a transcription file and add it to the vector database.
@@ -485,24 +564,67 @@ Be medically accurate and thorough."""
         with open(file_path, "r", encoding="utf-8") as f:
             content = f.read()
 
-        # Split content into chunks
-        chunks = self.text_splitter.split_text(content)
+        self.process_text(content, file_path, filename=original_filename or Path(file_path).name)
 
-        # Generate embeddings and add to ChromaDB
-        for i, chunk in enumerate(tqdm(chunks, desc="Processing chunks")):
-            embedding = self.get_embedding(chunk)
-
-            self.collection.add(
-                documents=[chunk],
-                embeddings=[embedding],
-                ids=[f"{Path(file_path).stem}_{i}"],
-                metadatas=[{
-                    "source": file_path,
-                    "chunk_id": i,
-                    "type": "text",
-                    "filename": original_filename or Path(file_path).name
-                }],
-            )
+    def process_text(self, content: str, source: str, filename: str | None = None):
+        """Chunk, embed and store text that is already in memory.
+        source names the document (storing it again replaces its chunks); filename is shown to users.
+        """
+        self._store_chunks(*self.text_chunks(content, source, filename), desc=f"Processing {Path(source).name}")
+
+    def bulk_add(self, chunk_sets):
+        """Embed and store chunks from several documents in one pass.
+        chunk_sets is a list of (documents, ids, metadatas) as returned by text_chunks
+        and pptx_chunks. Chunks from all documents share embedding requests and
+        collection writes, so many small files cost a few calls instead of several each.
+        """
+        documents, ids, metadatas = [], [], []
+        for docs, doc_ids, metas in chunk_sets:
+            documents.extend(docs)
+            ids.extend(doc_ids)
+            metadatas.extend(metas)
+        self._store_chunks(documents, ids, metadatas, desc=f"Processing {len(chunk_sets)} documents")
+
+    def text_chunks(self, content, source, filename=None):
+        """Split a document into (documents, ids, metadatas), ready for bulk_add."""
+        chunks = self.text_splitter.split_text(content)
+        key = _document_key(source, content)
+        ids = [f"{key}_{i}" for i in range(len(chunks))]
+        metadatas = [{
+            "source": source,
+            "chunk_id": i,
+            "type": "text",
+            "filename": filename or Path(source).name
+        } for i in range(len(chunks))]
+        return chunks, ids, metadatas
+
+    def _store_chunks(self, documents, ids, metadatas, desc="Processing chunks"):
+        """Embed chunks outside Chroma in batches, then upsert them in large writes.
+        Chunks already stored for the same sources are deleted before the first
+        write, so a re-uploaded file never keeps chunks from its earlier version."""
+        # Inputs per embedding request, and chunks per collection write
+        EMBED_BATCH_SIZE = 100
+        WRITE_BATCH_SIZE = 1000
+        stale_sources = {meta["source"] for meta in metadatas}
+        for start in tqdm(range(0, len(documents), WRITE_BATCH_SIZE), desc=desc):
+            stop = start + WRITE_BATCH_SIZE
+            batch = documents[start:stop]
+            embeddings = []
+            for offset in range(0, len(batch), EMBED_BATCH_SIZE):
+                embeddings.extend(self.get_embeddings_batch(batch[offset:offset + EMBED_BATCH_SIZE]))
+
+            with self._write_lock:
+                # Deleted only once the first batch is embedded, so a failed
+                # embedding request leaves the earlier version in place
+                for source in stale_sources:
+                    self.collection.delete(where={"source": source})
+                stale_sources = ()
+                self.collection.upsert(
+                    documents=batch,
+                    embeddings=embeddings,
+                    ids=ids[start:stop],
+                    metadatas=metadatas[start:stop],
+                )
 
     def query_knowledge_base(self, query, n_results=3):
         """Query the knowledge base with a natural language question."""
@@ -1,61 +1,168 @@
 import streamlit as st
 import os
-import tempfile
-import PyPDF2
+# PDF libraries, openai and the assistant (chromadb, langchain) are imported where
+# first used, so the login page renders without paying for them
 from pathlib import Path
-from ai_study_assistant_new import AIStudyAssistant
 import uuid
+import bcrypt
 import hashlib
-import openai
-import json
+import hmac
+import importlib.util
+import logging
+import orjson
+import queue
+import re
+import sqlite3
+import threading
 import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+from operator import itemgetter
+from typing import NamedTuple
+
+from app_shared import (
+    SHARED_DB_DIR, content_digest, get_assistant, load_ingested_hashes, page_headed_text,
+    pymupdf_pages, pypdf2_pages, save_ingested_hashes, warm_pdf_pool,
+)
+
+LOG_FILE = "study_guide.log"
+
+@st.cache_resource
+def get_logger():
+    """App logger writing to a rotating file; configured once per process."""
+    logger = logging.getLogger("study_guide")
+    handler = RotatingFileHandler(LOG_FILE, maxBytes=1_000_000, backupCount=3, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return logger
+
+logger = get_logger()
 
 # Initialize session state
 if 'user_id' not in st.session_state:
-    st.session_state.user_id = str(uuid.uuid4())[:8]
+    st.session_state.user_id = uuid.uuid4().hex[:8]
 if 'processed_files' not in st.session_state:
     st.session_state.processed_files = []
 
-# Persistent file tracking
-USER_FILES_DIR = "user_files"
-os.makedirs(USER_FILES_DIR, exist_ok=True)
+# Persistent file tracking (user_files table in USERS_DB)
+USER_FILES_DIR = "user_files"  # legacy per-user JSON lists, imported on first load
 
 def get_user_files_path(user_id):
-    """Get path to user's persistent file list."""
+    """Get path to user's legacy JSON file list."""
     return os.path.join(USER_FILES_DIR, f"{user_id}_files.json")
 
+@st.cache_data(ttl=None, show_spinner=False)
 def load_user_files(user_id):
-    """Load user's processed files from disk."""
+    """Load user's processed files in upload order (cached until the next save)."""
+    with users_db() as conn:
+        rows = conn.execute(
+            "SELECT filename FROM user_files WHERE user_id = ? ORDER BY rowid", (user_id,)
+        ).fetchall()
+    if rows:
+        return [row[0] for row in rows]
+    # One-time import of the user's old JSON list
     file_path = get_user_files_path(user_id)
     if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        with open(file_path, 'rb') as f:
+            files = orjson.loads(f.read())
+        with users_db() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO user_files (user_id, filename) VALUES (?, ?)",
+                [(user_id, filename) for filename in files],
+            )
+        return files
     return []
 
 def save_user_files(user_id, files):
-    """Save user's processed files to disk."""
-    file_path = get_user_files_path(user_id)
-    with open(file_path, 'w') as f:
-        json.dump(files, f, indent=2)
+    """Record user's processed files; names already stored are left as they are."""
+    with users_db() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO user_files (user_id, filename) VALUES (?, ?)",
+            [(user_id, filename) for filename in files],
+        )
+    load_user_files.clear()
+
+def record_processed_file(filename):
+    """Add a filename to the session's processed list unless it is already there."""
+    if filename not in st.session_state.processed_files_set:
+        st.session_state.processed_files_set.add(filename)
+        st.session_state.processed_files.append(filename)
+
+def _sha256_nonsecurity():
+    """SHA-256 for ids, not for secrets."""
+    return hashlib.sha256(usedforsecurity=False)
 
 ############################
 # Authentication & API Key #
 ############################
 
-# User database file
-USERS_FILE = "users.json"
+# User database files
+USERS_DB = "users.db"  # accounts and per-user file lists
+USERS_FILE = "users.json"  # legacy store, imported into USERS_DB on first boot
+BCRYPT_ROUNDS = 12
 
 def load_users():
-    """Load users from JSON file."""
+    """Load users from the legacy JSON file."""
     if os.path.exists(USERS_FILE):
-        with open(USERS_FILE, 'r') as f:
-            return json.load(f)
+        with open(USERS_FILE, 'rb') as f:
+            return orjson.loads(f.read())
     return {}
 
-def save_users(users):
-    """Save users to JSON file."""
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users, f, indent=2)
+def _legacy_created_at(info):
+    """Unix creation time of a legacy account; old UUID placeholders map to 0."""
+    created_at = info.get("created_at")
+    return created_at if isinstance(created_at, int) else 0
+
+@st.cache_resource
+def get_users_db():
+    """Open the shared users database, creating and migrating it if needed.
+    The connection is shared by every session; use it through users_db()."""
+    conn = sqlite3.connect(USERS_DB, check_same_thread=False)
+    # WAL lets readers proceed while another session is writing
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS users ("
+        "username TEXT PRIMARY KEY, "
+        "password_hash TEXT NOT NULL, "
+        "created_at INTEGER)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS user_files ("
+        "user_id TEXT NOT NULL, "
+        "filename TEXT NOT NULL, "
+        "PRIMARY KEY (user_id, filename))"
+    )
+    # One-time migration of accounts from the old users.json file
+    if conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+        legacy = load_users()
+        if legacy:
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
+                    [(name, info["password_hash"], _legacy_created_at(info)) for name, info in legacy.items()],
+                )
+    return conn
+
+@st.cache_resource
+def _users_db_lock():
+    """One lock per server process for the shared users connection."""
+    return threading.Lock()
+
+@contextmanager
+def users_db():
+    """The shared users connection, used by one session thread at a time.
+    Commits on success and rolls back on error, like `with conn:`. Without the
+    lock, one session's rollback could undo another's write in progress on it."""
+    with _users_db_lock(), get_users_db() as conn:
+        yield conn
+
+def hash_password(password: str) -> str:
+    """Hash a password with bcrypt for storage."""
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 def create_user(username: str, password: str) -> tuple[bool, str]:
     """Create a new user account.
@@ -66,81 +173,137 @@ def create_user(username: str, password: str) -> tuple[bool, str]:
     if len(password) < 6:
         return False, "Password must be at least 6 characters."
     
-    users = load_users()
-    
-    if username in users:
+    # Hash the password (bcrypt embeds its own salt)
+    pwd_hash = hash_password(password)
+    # The primary key rejects duplicates, so two sessions racing for one name can't both win
+    try:
+        with users_db() as conn:
+            conn.execute(
+                "INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
+                (username, pwd_hash, int(time.time())),
+            )
+    except sqlite3.IntegrityError:
         return False, "Username already exists."
     
-    # Hash the password
-    pwd_hash = hashlib.sha256(password.encode()).hexdigest()
-    users[username] = {
-        "password_hash": pwd_hash,
-        "created_at": str(uuid.uuid4())  # Use as timestamp placeholder
-    }
-    
-    save_users(users)
     return True, "Account created successfully!"
 
+@st.cache_resource
+def _attempt_key() -> bytes:
+    """Random per-process key for credential cache keys, so they cannot be
+    checked against guessed passwords without it."""
+    return os.urandom(32)
+
+class _CredentialsRejected(Exception):
+    """Raised by _check_credentials; st.cache_data does not cache exceptions."""
+
 def verify_credentials(username: str, password: str) -> bool:
     """Verify username/password against stored users.
-    Returns True if credentials match; False otherwise."""
-    users = load_users()
-    
-    if username not in users:
+    Returns True if credentials match; False otherwise.
+    Repeated successful logins within a short window reuse the first answer
+    instead of running bcrypt again. Failures are never cached."""
+    attempt = hashlib.blake2b(f"{username}:{password}".encode(), key=_attempt_key(), digest_size=16).digest()
+    try:
+        return _check_credentials(username, attempt, password)
+    except _CredentialsRejected:
         return False
-    
-    pwd_hash = hashlib.sha256(password.encode()).hexdigest()
-    return users[username]["password_hash"] == pwd_hash
 
-def auth_gate():
-    """Sidebar authentication gate. Sets st.session_state.authenticated."""
-    if "authenticated" not in st.session_state:
-        st.session_state.authenticated = False
+@st.cache_data(ttl=30, max_entries=1024, show_spinner=False)
+def _check_credentials(username: str, attempt: bytes, _password: str) -> bool:
+    """The uncached check behind verify_credentials; raises _CredentialsRejected
+    on a mismatch. The cache is keyed on a keyed digest of the attempt; the
+    password itself is never hashed into the cache key."""
+    with users_db() as conn:
+        row = conn.execute(
+            "SELECT password_hash FROM users WHERE username = ?", (username,)
+        ).fetchone()
     
-    if "current_username" not in st.session_state:
-        st.session_state.current_username = None
-
-    if st.session_state.authenticated:
+    if row is None:
+        raise _CredentialsRejected(username)
+    
+    stored_hash = row[0]
+    if stored_hash.startswith("$2"):
+        if not bcrypt.checkpw(_password.encode(), stored_hash.encode()):
+            raise _CredentialsRejected(username)
         return True
+    
+    # Legacy unsalted SHA-256 hash: verify it, then upgrade the row to bcrypt
+    pwd_hash = hashlib.sha256(_password.encode()).hexdigest()
+    if not hmac.compare_digest(stored_hash, pwd_hash):
+        raise _CredentialsRejected(username)
+    new_hash = hash_password(_password)  # bcrypt runs outside the connection lock
+    with users_db() as conn:
+        conn.execute(
+            "UPDATE users SET password_hash = ? WHERE username = ?",
+            (new_hash, username),
+        )
+    return True
+
+@lru_cache(maxsize=256)
+def user_id_for(username: str) -> str:
+    """Derive the stable storage id (db_<id>, user file names) for a username.
+    Must not change: existing users' databases are named after it."""
+    hasher = _sha256_nonsecurity()
+    hasher.update(username.encode())
+    return hasher.hexdigest()[:8]
 
-    with st.sidebar.expander("🔐 Authentication", expanded=True):
+# Fragments rerun only their own widgets on interaction, not the whole script
+@st.fragment
+def _auth_panel():
+    """Login / account creation form.
+    The fields sit in an st.form, so typing reruns nothing until it is submitted."""
+    with st.expander("🔐 Authentication", expanded=True):
         auth_mode = st.radio("Select mode:", ["Login", "Create Account"])
         
-        username = st.text_input("Username", key="auth_username")
-        password = st.text_input("Password", type="password", key="auth_password")
+        with st.form("auth_form"):
+            username = st.text_input("Username", key="auth_username")
+            password = st.text_input("Password", type="password", key="auth_password")
+            submitted = st.form_submit_button(auth_mode)
         
         if auth_mode == "Login":
-            if st.button("Login"):
+            if submitted:
                 if verify_credentials(username, password):
                     st.session_state.authenticated = True
                     st.session_state.current_username = username
-                    # Use username as user_id for persistent storage
-                    st.session_state.user_id = hashlib.sha256(username.encode()).hexdigest()[:8]
+                    # Use username as user_id for persistent storage (derived once per login)
+                    st.session_state.user_id = user_id_for(username)
                     st.success("Login successful!")
-                    st.rerun()
+                    st.rerun()  # full rerun: the rest of the app unlocks
                 else:
                     st.error("Invalid username or password.")
         else:  # Create Account
-            if st.button("Create Account"):
+            if submitted:
                 success, message = create_user(username, password)
                 if success:
                     st.success(message)
                     st.info("You can now login with your new account.")
                 else:
                     st.error(message)
+
+def auth_gate():
+    """Sidebar authentication gate. Sets st.session_state.authenticated."""
+    if "authenticated" not in st.session_state:
+        st.session_state.authenticated = False
     
-    return False
+    if "current_username" not in st.session_state:
+        st.session_state.current_username = None
 
-def ensure_api_key():
-    """Allow user to input API key; fallback to environment variable.
-    Returns True if an API key is set, else False."""
-    if "api_key" not in st.session_state:
-        st.session_state.api_key = None
+    if st.session_state.authenticated:
+        return True
+
+    # Fragments can't write into the sidebar from outside, so call it from within
+    with st.sidebar:
+        _auth_panel()
+    
+    return False
 
-    with st.sidebar.expander("🔑 OpenAI API Key", expanded=False):
+@st.fragment
+def _api_key_panel():
+    """API key input; a changed key triggers a full rerun so the app sees it."""
+    with st.expander("🔑 OpenAI API Key", expanded=False):
         entered = st.text_input("Enter API key", type="password", placeholder="sk-...")
-        if entered:
+        if entered and entered.strip() != st.session_state.api_key:
             st.session_state.api_key = entered.strip()
+            st.rerun()
         # Feedback
         if st.session_state.api_key:
             st.success("API key set for this session.")
@@ -149,128 +312,356 @@ def ensure_api_key():
         else:
             st.warning("No API key provided yet; AI features disabled.")
 
+def ensure_api_key():
+    """Allow user to input API key; fallback to environment variable.
+    Returns True if an API key is set, else False."""
+    if "api_key" not in st.session_state:
+        st.session_state.api_key = None
+
+    with st.sidebar:
+        _api_key_panel()
+
     final_key = st.session_state.api_key or os.getenv("OPENAI_API_KEY")
     if not final_key:
         return False
-    openai.api_key = final_key
+    import openai
+
+    # Only reconfigure the openai module when the key actually changes.
+    # Compare against the module itself: it is shared by every session.
+    if openai.api_key != final_key:
+        openai.api_key = final_key
     return True
 
-# Initialize the AI Study Assistant with user-specific collection
+@st.cache_data(persist="disk", show_spinner=False, max_entries=256)
+def extract_test_questions(test_bytes: bytes, _assistant):
+    """Extract questions and answers from a practice test PDF, cached on its contents.
+    Persisted to disk: the result depends only on the test, and it costs an
+    OpenAI call per test, so it is kept across sessions and server restarts.
+    Raises ValueError when no questions come back, so a failed read is never cached."""
+    questions_data = _assistant.extract_questions_and_answers(test_bytes, file_type=".pdf")
+    if not questions_data.get('questions'):
+        raise ValueError("no questions found in the test")
+    return questions_data
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def analyze_test(test_bytes: bytes, questions_to_review: tuple, fast_mode: bool,
+                 user_id, materials: tuple, _assistant, _questions_data):
+    """Map a practice test's questions to slides, cached per test, user and uploaded materials."""
+    return _assistant.create_targeted_study_guide(
+        test_bytes,
+        list(questions_to_review),
+        fast_mode=fast_mode,
+        file_type=".pdf",
+        questions_data=_questions_data,
+    )
+
+# Number of recently active users whose assistants are warmed at startup
+PRELOAD_ASSISTANTS = 8
+
+def _preload_recent_assistants(limit=PRELOAD_ASSISTANTS):
+    """Open the most recently used user DBs so returning users skip the cold start."""
+    db_dirs = [p for p in Path(".").glob("db_*") if p.is_dir() and p.name != SHARED_DB_DIR]
+    db_dirs.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    for db_dir in db_dirs[:limit]:
+        try:
+            get_assistant(db_dir.name[len("db_"):]).collection
+        except Exception:
+            # A broken DB only loses its warm start; it fails loudly on real use
+            pass
+
+def _preload():
+    warm_pdf_pool()
+    _preload_recent_assistants()
+
 @st.cache_resource
-def get_assistant(user_id, _version=3):  # Increment version to force cache refresh
-    return AIStudyAssistant(persist_directory=f"db_{user_id}")
+def start_assistant_preloader():
+    """Warm a PDF worker and recent users' assistants once per server process,
+    in the background."""
+    thread = threading.Thread(target=_preload, daemon=True)
+    thread.start()
+    return thread
 
-def process_uploaded_pdf(uploaded_file, assistant):
-    """Process an uploaded PDF file and add to vector database."""
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_path = tmp_file.name
-    
+def _pdf_text_pymupdf(uploaded_file):
+    """Page-headed text of a PDF upload via PyMuPDF's C parser.
+    Large documents are split across the shared process pool."""
+    return page_headed_text(pymupdf_pages(uploaded_file))
+
+def _pdf_text_pypdf2(uploaded_file):
+    """Page-headed text of a PDF upload via PyPDF2."""
+    return page_headed_text(pypdf2_pages(uploaded_file))
+
+def _pdf_text_pdfium(uploaded_file):
+    """Page-headed text of a PDF upload via pypdfium2 (Google's PDFium)."""
+    pages = []
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(uploaded_file.getvalue())
     try:
-        # Extract text from PDF
-        with open(tmp_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text_content = ""
-            for page_num, page in enumerate(pdf_reader.pages):
-                text_content += f"\n\nPage {page_num + 1}\n{'-'*20}\n"
-                text_content += page.extract_text()
-        
-        # Save to temporary text file
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt', encoding='utf-8') as txt_file:
-            txt_file.write(f"Content from {uploaded_file.name}\n{'='*50}\n\n")
-            txt_file.write(text_content)
-            txt_path = txt_file.name
-        
-        # Process with assistant
-        assistant.process_transcription(txt_path)
-        
-        # Cleanup
-        os.unlink(tmp_path)
-        os.unlink(txt_path)
-        
-        return True
-    except Exception as e:
-        st.error(f"Error processing PDF: {str(e)}")
-        return False
+        for page_num in range(len(pdf)):
+            page = pdf[page_num]
+            textpage = page.get_textpage()
+            pages.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+    return page_headed_text(pages)
 
-def process_uploaded_pptx(uploaded_file, assistant):
-    """Process an uploaded PowerPoint file and add to vector database."""
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pptx') as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_path = tmp_file.name
-    
+# Primary PDF text extractor: "pymupdf" (default), "pdfium" or "pypdf2".
+# A backend that is not installed is skipped; PyPDF2 is always the last resort.
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pymupdf").lower()
+PDF_EXTRACTORS = {
+    "pymupdf": ("fitz", _pdf_text_pymupdf),
+    "pdfium": ("pypdfium2", _pdf_text_pdfium),
+}
+
+def extract_pdf_text(uploaded_file):
+    """Extract an uploaded PDF's text with the PDF_BACKEND extractor.
+    PyPDF2 is the fallback when that backend is missing or rejects a malformed file.
+    Returns (text, backend), backend being the name of the extractor that produced it."""
+    module_name, extractor = PDF_EXTRACTORS.get(PDF_BACKEND, (None, None))
+    # find_spec checks that the backend is installed without importing it
+    if module_name is not None and importlib.util.find_spec(module_name) is not None:
+        try:
+            return extractor(uploaded_file), PDF_BACKEND
+        except Exception:
+            logger.warning("%s could not read %s; falling back to PyPDF2", PDF_BACKEND, uploaded_file.name)
+    return _pdf_text_pypdf2(uploaded_file), "pypdf2"
+
+# Extracted PDF text, one file per content digest and backend, shared by all users
+TEXT_CACHE_DIR = Path(".pdf_text_cache")
+
+def cached_pdf_text(uploaded_file, digest):
+    """Extract an uploaded PDF's text, reusing an earlier extraction of the same bytes.
+    Only text from the configured PDF_BACKEND is cached: a PyPDF2 fallback may be
+    down to a passing failure (e.g. a crashed worker pool), and text with pages
+    skipped on the extraction time limit is incomplete. Both are extracted again
+    on the next upload of the file."""
+    from pdf_extract import SKIPPED_PAGE_TEXT
+    # Keyed on the backend too, so switching PDF_BACKEND takes effect on cached files
+    cache_path = TEXT_CACHE_DIR / f"{digest}.{PDF_BACKEND}.txt"
     try:
-        # Process with assistant, preserving original filename
-        assistant.process_pptx(tmp_path, original_filename=uploaded_file.name)
+        return cache_path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        pass
+    text_content, backend = extract_pdf_text(uploaded_file)
+    if backend != PDF_BACKEND or SKIPPED_PAGE_TEXT in text_content:
+        return text_content
+    TEXT_CACHE_DIR.mkdir(exist_ok=True)
+    # Unique temp name: two sessions may extract the same file at once
+    tmp_path = cache_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(text_content, encoding="utf-8")
+    os.replace(tmp_path, cache_path)
+    return text_content
+
+class PartialExtraction(NamedTuple):
+    """An upload's item with some of its content missing; it is stored, but not
+    recorded as ingested, so uploading the file again retries it."""
+    item: object
+
+def extract_uploaded_pdf(uploaded_file, assistant):
+    """Extract and chunk an uploaded PDF for AIStudyAssistant.bulk_add.
+    Runs on upload worker threads, so errors are raised rather than shown."""
+    from pdf_extract import SKIPPED_PAGE_TEXT
+    text_content = cached_pdf_text(uploaded_file, content_digest(uploaded_file))
+    chunks = assistant.text_chunks(
+        f"Content from {uploaded_file.name}\n{'='*50}\n\n{text_content}",
+        uploaded_file.name,
+    )
+    return PartialExtraction(chunks) if SKIPPED_PAGE_TEXT in text_content else chunks
+
+def extract_uploaded_pptx(uploaded_file, assistant):
+    """Extract an uploaded PowerPoint file's slides for AIStudyAssistant.bulk_add.
+    Runs on upload worker threads, so errors are raised rather than shown."""
+    # python-pptx reads the upload's own buffer; no temp file or copy needed
+    uploaded_file.seek(0)
+    return assistant.pptx_chunks(uploaded_file, original_filename=uploaded_file.name)
+
+# Upper bound on uploaded files processed at the same time
+MAX_UPLOAD_WORKERS = 8
+
+def _ingest_worker(assistant, work, events):
+    """Consumer stage: store extracted items as they arrive, one bulk_add at a time.
+    Whatever has queued up while the previous batch was embedding goes in the
+    next batch, so files extracted close together share embedding requests."""
+    finished = False
+    while not finished:
+        group = [work.get()]
+        while True:
+            try:
+                group.append(work.get_nowait())
+            except queue.Empty:
+                break
+        if None in group:  # sentinel: nothing more will be extracted
+            finished = True
+            group = [entry for entry in group if entry is not None]
+        if not group:
+            continue
+        try:
+            assistant.bulk_add([item for _, _, item in group])
+        except Exception as e:
+            events.put(("ingested", group, e))
+        else:
+            events.put(("ingested", group, None))
+
+def process_uploads(files, process_fn, assistant):
+    """Run process_fn(file, assistant) over uploaded files on a thread pool, skipping files already ingested.
+    Extraction and embedding are mostly waiting on I/O and the OpenAI API, so
+    threads overlap well. process_fn only extracts and returns an item for
+    AIStudyAssistant.bulk_add; a single consumer thread stores items while later
+    files are still being extracted, so vector-store writes stay serial in that one thread.
+    All Streamlit calls stay on the script thread; only the progress bar
+    updates live, per-file status is written once at the end."""
+    progress_bar = st.progress(0)
+    messages = []
+    errors = []
+    pending = []
+    partial = set()  # digests of uploads stored with some content missing
+    for file in files:
+        digest = content_digest(file)
+        if digest in st.session_state.ingested_hashes:
+            record_processed_file(file.name)
+            messages.append(f"⏭ {file.name} (already processed)")
+        else:
+            pending.append((file, digest))
+    
+    def mark_done(file, digest):
+        record_processed_file(file.name)
+        if digest in partial:
+            messages.append(f"⚠ {file.name} (some pages could not be read; upload it again to retry)")
+        else:
+            st.session_state.ingested_hashes.add(digest)
+            messages.append(f"✓ {file.name}")
+    
+    done = len(files) - len(pending)
+    progress_bar.progress(done / len(files), text=f"Processed {done}/{len(files)} files")
+    if pending:
+        # Worker and consumer threads report here; only this thread touches Streamlit
+        events = queue.Queue()
+        work = queue.Queue()
+        consumer = threading.Thread(target=_ingest_worker, args=(assistant, work, events), daemon=True)
+        consumer.start()
         
-        # Cleanup
-        os.unlink(tmp_path)
+        with ThreadPoolExecutor(max_workers=min(MAX_UPLOAD_WORKERS, len(pending))) as executor:
+            for file, digest in pending:
+                future = executor.submit(process_fn, file, assistant)
+                future.add_done_callback(
+                    lambda f, file=file, digest=digest: events.put(("extracted", file, digest, f))
+                )
+            
+            extracting, ingesting = len(pending), 0
+            while extracting or ingesting:
+                event = events.get()
+                if event[0] == "extracted":
+                    _, file, digest, future = event
+                    extracting -= 1
+                    try:
+                        item = future.result()
+                    except Exception as e:
+                        errors.append(f"Error processing {file.name}: {str(e)}")
+                        done += 1
+                    else:
+                        if isinstance(item, PartialExtraction):
+                            partial.add(digest)
+                            item = item.item
+                        work.put((file, digest, item))
+                        ingesting += 1
+                else:
+                    _, group, error = event
+                    ingesting -= len(group)
+                    done += len(group)
+                    for file, digest, _ in group:
+                        if error:
+                            errors.append(f"Error embedding {file.name}: {str(error)}")
+                        else:
+                            mark_done(file, digest)
+                progress_bar.progress(done / len(files), text=f"Processed {done}/{len(files)} files")
         
-        return True
-    except Exception as e:
-        st.error(f"Error processing PowerPoint: {str(e)}")
-        return False
+        work.put(None)
+        consumer.join()
+    
+    if messages:
+        st.success("  \n".join(messages))
+    if errors:
+        st.error("  \n".join(errors))
+    
+    save_user_files(st.session_state.user_id, st.session_state.processed_files)
+    save_ingested_hashes(st.session_state.user_id, st.session_state.ingested_hashes)
 
+@st.cache_data(show_spinner=False)
 def format_slide_recommendations(question_slides_map):
     """Format slide recommendations grouped by question."""
-    output = "### 📊 Questions & Slides to Review\n\n"
+    parts = ["### 📊 Questions & Slides to Review\n\n"]
     
     for q_num, slides_by_file in question_slides_map.items():
-        output += f"**Question {q_num}:**\n"
+        parts.append(f"**Question {q_num}:**\n")
         for filename, slides in slides_by_file.items():
             slide_numbers = [slide['slide_number'] for slide in slides]
-            output += f"  - **{filename}**: Slides {', '.join(map(str, slide_numbers))}\n"
-        output += "\n"
+            parts.append(f"  - **{filename}**: Slides {', '.join(map(str, slide_numbers))}\n")
+        parts.append("\n")
     
-    return output
+    return "".join(parts)
 
+# Slide topic: up to 60 characters of the first sentence
+_TOPIC_RE = re.compile(r'[^.]{0,60}')
+
+# Slide text shown in summaries and the detailed-content expander is capped at this length
+SLIDE_SNIPPET_CHARS = 400
+
+def slide_snippet(content):
+    """Truncate slide content for display."""
+    return content[:SLIDE_SNIPPET_CHARS] + "..." if len(content) > SLIDE_SNIPPET_CHARS else content
+
+def format_question_slide_details(q_num, slides_by_file):
+    """Markdown for one question's slides, each truncated and shown verbatim in a code block.
+    Plain string building; there is nothing numeric here for a JIT to speed up."""
+    parts = [f"### Question {q_num}\n\n"]
+    for filename, slides in slides_by_file.items():
+        parts.append(f"**{filename}**\n\n")
+        for slide in slides:
+            parts.append(f"**Slide {slide['slide_number']}:**\n```\n{slide_snippet(slide['content'])}\n```\n\n")
+    return "".join(parts)
+
+@st.cache_data(show_spinner=False)
 def format_priority_slides(question_slides_map):
     """Format priority slides grouped by file and slide, showing which questions each slide addresses."""
     # Reorganize data: file -> slide_num -> {questions: [], content: str}
-    slide_info = {}
+    slide_info = defaultdict(dict)
     
     for q_num, slides_by_file in question_slides_map.items():
         for filename, slides in slides_by_file.items():
-            if filename not in slide_info:
-                slide_info[filename] = {}
-            
+            file_slides = slide_info[filename]
             for slide in slides:
-                slide_num = slide['slide_number']
-                if slide_num not in slide_info[filename]:
-                    slide_info[filename][slide_num] = {
-                        'questions': [],
-                        'content': slide.get('content', '')
-                    }
-                slide_info[filename][slide_num]['questions'].append(q_num)
+                info = file_slides.setdefault(
+                    slide['slide_number'],
+                    {'questions': [], 'content': slide.get('content', '').strip()[:SLIDE_SNIPPET_CHARS]},
+                )
+                info['questions'].append(q_num)
     
     # Format output
-    output = "### 🎯 Priority Slides to Review\n\n"
+    parts = ["### 🎯 Priority Slides to Review\n\n"]
     
     for filename in sorted(slide_info.keys()):
-        output += f"**{filename}**\n"
-        sorted_slides = sorted(slide_info[filename].items())
+        parts.append(f"**{filename}**\n")
+        sorted_slides = sorted(slide_info[filename].items(), key=itemgetter(0))
         
         for slide_num, info in sorted_slides:
             questions = sorted(info['questions'])
             q_list = ', '.join(map(str, questions))
             
-            # Extract a brief topic from the slide content (first 60 chars or first sentence)
-            content = info['content'].strip()
-            # Try to get first sentence or first line
-            topic = content.split('.')[0] if '.' in content[:100] else content[:60]
-            topic = topic.strip().replace('\n', ' ')[:60]
+            # Extract a brief topic from the slide content (first sentence, at most 60 chars)
+            content = info['content']
+            topic = _TOPIC_RE.match(content).group(0).strip().replace('\n', ' ')
             if len(content) > 60:
                 topic += "..."
             
-            output += f"  - **Slide {slide_num}**: {topic} *Test Qs: {q_list}*\n"
+            parts.append(f"  - **Slide {slide_num}**: {topic} *Test Qs: {q_list}*\n")
         
-        output += "\n"
+        parts.append("\n")
     
-    return output
+    return "".join(parts)
 
 def shorten_filename(filename):
     """Create meaningful shortened names from long filenames."""
-    import re
     # Remove file extension
     name = filename.replace('.pptx', '').replace('.pdf', '')
     # Remove dates (YYYY-MM-DD format)
@@ -296,7 +687,7 @@ def format_question_slide_summary(question_slides_map):
         "|---------:|:-------------------|",
     ]
     # sort by numeric question order
-    for q_num in sorted(question_slides_map, key=lambda x: int(x)):
+    for q_num in sorted(question_slides_map, key=int):
         # Group slides by filename and list slide numbers once per file
         per_file = []
         for filename, slides in question_slides_map[q_num].items():
@@ -306,6 +697,7 @@ def format_question_slide_summary(question_slides_map):
         lines.append(f"| **Q{q_num}** | {' · '.join(per_file)} |")
     return "\n".join(lines)
 
+@st.cache_data(show_spinner=False)
 def format_detailed_explanations(question_slides_map, questions_data=None):
     """Create detailed section with explanations for each question-to-slide mapping."""
     lines = [
@@ -317,7 +709,7 @@ def format_detailed_explanations(question_slides_map, questions_data=None):
         ""
     ]
     
-    for q_num in sorted(question_slides_map, key=lambda x: int(x)):
+    for q_num in sorted(question_slides_map, key=int):
         lines.append(f"---")
         lines.append(f"### Question {q_num}")
         lines.append("")
@@ -348,6 +740,7 @@ def format_detailed_explanations(question_slides_map, questions_data=None):
         
     return "\n".join(lines)
 
+@st.cache_data(show_spinner=False)
 def format_question_slide_summary(question_slides_map):
 
     """Return a compact markdown table mapping each question to its recommended slides."""
@@ -359,7 +752,7 @@ def format_question_slide_summary(question_slides_map):
         "|---------:|--------|",
     ]
     # sort by numeric question order
-    for q_num in sorted(question_slides_map, key=lambda x: int(x)):
+    for q_num in sorted(question_slides_map, key=int):
         # Group slides by filename and list slide numbers once per file
         per_file = []
         for filename, slides in question_slides_map[q_num].items():
@@ -368,11 +761,114 @@ def format_question_slide_summary(question_slides_map):
         lines.append(f"| {q_num} | {'; '.join(per_file)} |")
     return "\n".join(lines)
 
+@st.fragment
+def upload_materials(assistant):
+    """Sidebar upload panels and the processed-files list.
+    Picking files and processing them reruns only this panel."""
+    # PowerPoint upload section
+    with st.expander("Upload PowerPoint Slides", expanded=False):
+        pptx_files = st.file_uploader(
+            "Upload lecture slides (.pptx)",
+            type=['pptx'],
+            accept_multiple_files=True,
+            help="Upload your class PowerPoint slides",
+            key="pptx_uploader"
+        )
+        
+        if pptx_files:
+            if st.button("Process PowerPoint Files"):
+                process_uploads(pptx_files, extract_uploaded_pptx, assistant)
+                st.success("All PowerPoint files processed!")
+    
+    # PDF upload section
+    with st.expander("Upload PDF Notes", expanded=False):
+        pdf_files = st.file_uploader(
+            "Upload PDF files (notes, textbooks, etc.)",
+            type=['pdf'],
+            accept_multiple_files=True,
+            help="Upload PDF class materials",
+            key="pdf_uploader"
+        )
+        
+        if pdf_files:
+            if st.button("Process PDF Files"):
+                process_uploads(pdf_files, extract_uploaded_pdf, assistant)
+                st.success("All PDF files processed!")
+    
+    # Show processed files
+    if st.session_state.processed_files:
+        st.markdown("---")
+        st.write("**📁 Processed Materials:**")
+        for filename in st.session_state.processed_files:
+            st.write(f"- {filename}")
+
+def grade_answers(questions, correct_answers, user_answers):
+    """Compare the user's answers with the key for every question that has one.
+    Returns (wrong, unanswered, total): sorted question numbers answered wrongly
+    or not at all, and the number of questions graded."""
+    # Each side is normalized once, so grading is plain string equality per question
+    answer_key = {q: a.strip().upper() for q, a in correct_answers.items() if a and a.strip() and q in questions}
+    answers = {q: a.strip().upper() for q, a in user_answers.items() if a and a.strip() and q in answer_key}
+    unanswered = sorted(int(q) for q in answer_key.keys() - answers.keys())
+    wrong = sorted(int(q) for q, answer in answers.items() if answer != answer_key[q])
+    return wrong, unanswered, len(answer_key)
+
+def render_analysis(result, questions_data):
+    """Render a practice-test analysis: summary first, details in expanders."""
+    # Show validation metrics
+    if 'total_questions' in result and 'questions_mapped' in result:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Questions", result['total_questions'])
+        with col2:
+            st.metric("Questions Mapped", result['questions_mapped'])
+        with col3:
+            coverage = (result['questions_mapped'] / result['total_questions'] * 100) if result['total_questions'] > 0 else 0
+            st.metric("Coverage", f"{coverage:.0f}%")
+    
+    st.markdown("---")
+    
+    # SUMMARY SECTION
+    if 'question_slides_map' in result:
+        st.markdown(format_question_slide_summary(result['question_slides_map']))
+    
+    st.markdown("---")
+    
+    # DETAILED SECTION
+    if 'question_slides_map' in result:
+        # Detailed explanations with slide content
+        st.markdown(format_detailed_explanations(result['question_slides_map'], questions_data))
+        
+    st.markdown("---")
+    
+    # Study guide from GPT (now in expander to reduce clutter)
+    with st.expander("🤖 AI-Generated Study Guide (Full Text)", expanded=False):
+        st.markdown(result.get('study_guide', 'No study guide generated'))
+    
+    st.markdown("---")
+
+    # Show question-to-slide mapping - DETAILS AFTER
+    if 'question_slides_map' in result:
+        # Show question-by-question breakdown in expander
+        with st.expander("📋 View by Question (which slides for each question)"):
+            st.markdown(format_slide_recommendations(result['question_slides_map']))
+        
+        # Show detailed slide content by question, one markdown element per question
+        with st.expander("� View Detailed Slide Content"):
+            for q_num, slides_by_file in result['question_slides_map'].items():
+                st.markdown(format_question_slide_details(q_num, slides_by_file))
+    
+    # Show test analysis details at the very bottom
+    with st.expander("🔍 Detailed Test Analysis (Question-by-Question)"):
+        st.markdown(result.get('test_analysis', 'No analysis available'))
+
 def main():
     st.title("🎯 Practice Test Analyzer")
     st.write("""Upload your class materials (PowerPoint slides and PDF notes) and practice tests. 
     Mark which questions you got wrong, and the app will identify the exact slides you need to review!""")
 
+    start_assistant_preloader()
+
     # Auth first
     if not auth_gate():
         st.stop()
@@ -385,62 +881,18 @@ def main():
     # Load user's previously processed files
     if not st.session_state.processed_files:
         st.session_state.processed_files = load_user_files(st.session_state.user_id)
+    # Shadow set for O(1) membership checks on the processed list
+    if 'processed_files_set' not in st.session_state:
+        st.session_state.processed_files_set = set(st.session_state.processed_files)
+    # Hashes of files already embedded, so identical re-uploads are skipped
+    if 'ingested_hashes' not in st.session_state:
+        st.session_state.ingested_hashes = load_ingested_hashes(st.session_state.user_id)
     
     # Sidebar for file management
     with st.sidebar:
         st.header("📚 Upload Class Materials")
         
-        # PowerPoint upload section
-        with st.expander("Upload PowerPoint Slides", expanded=False):
-            pptx_files = st.file_uploader(
-                "Upload lecture slides (.pptx)",
-                type=['pptx'],
-                accept_multiple_files=True,
-                help="Upload your class PowerPoint slides",
-                key="pptx_uploader"
-            )
-            
-            if pptx_files:
-                if st.button("Process PowerPoint Files"):
-                    progress_bar = st.progress(0)
-                    for i, file in enumerate(pptx_files):
-                        st.write(f"Processing {file.name}...")
-                        if process_uploaded_pptx(file, assistant):
-                            if file.name not in st.session_state.processed_files:
-                                st.session_state.processed_files.append(file.name)
-                            st.success(f"✓ {file.name}")
-                        progress_bar.progress((i + 1) / len(pptx_files))
-                    save_user_files(st.session_state.user_id, st.session_state.processed_files)
-                    st.success("All PowerPoint files processed!")
-        
-        # PDF upload section
-        with st.expander("Upload PDF Notes", expanded=False):
-            pdf_files = st.file_uploader(
-                "Upload PDF files (notes, textbooks, etc.)",
-                type=['pdf'],
-                accept_multiple_files=True,
-                help="Upload PDF class materials",
-                key="pdf_uploader"
-            )
-            
-            if pdf_files:
-                if st.button("Process PDF Files"):
-                    progress_bar = st.progress(0)
-                    for i, file in enumerate(pdf_files):
-                        st.write(f"Processing {file.name}...")
-                        if process_uploaded_pdf(file, assistant):
-                            st.session_state.processed_files.append(file.name)
-                            st.success(f"✓ {file.name}")
-                        progress_bar.progress((i + 1) / len(pdf_files))
-                    save_user_files(st.session_state.user_id, st.session_state.processed_files)
-                    st.success("All PDF files processed!")
-        
-        # Show processed files
-        if st.session_state.processed_files:
-            st.markdown("---")
-            st.write("**📁 Processed Materials:**")
-            for filename in st.session_state.processed_files:
-                st.write(f"- {filename}")
+        upload_materials(assistant)
         
         st.markdown("---")
         # User info and logout
@@ -451,6 +903,8 @@ def main():
         if st.button("🚪 Logout"):
             st.session_state.authenticated = False
             st.session_state.current_username = None
+            st.session_state.pop('ingested_hashes', None)
+            st.session_state.pop('last_result', None)
             st.rerun()
     
     # Main content area - Practice Test Analyzer
@@ -471,18 +925,23 @@ def main():
     
     # Step 1: Extract and analyze test
     if practice_test:
-        if st.button("� Analyze Test & Find Slides to Review", type="primary"):
+        # An analysis is only valid for the same test, mode and uploaded materials
+        analysis_key = (content_digest(practice_test), fast_mode, tuple(st.session_state.processed_files))
+        last = st.session_state.get("last_result")
+        last_matches = last is not None and last["key"] == analysis_key
+        if st.button("� Analyze Test & Find Slides to Review", type="primary") and not last_matches:
             if not api_ready:
                 st.error("Please provide an API key to enable analysis.")
             else:
-                # Save practice test temporarily
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(practice_test.getvalue())
-                    tmp_path = tmp_file.name
+                # The test's bytes double as the cache key for extraction and analysis
+                test_bytes = practice_test.getvalue()
                 
                 try:
                     with st.spinner("📖 Extracting questions and answers from test..."):
-                        questions_data = assistant.extract_questions_and_answers(tmp_path)
+                        try:
+                            questions_data = extract_test_questions(test_bytes, assistant)
+                        except ValueError:
+                            questions_data = {}
                     
                     questions = questions_data.get('questions', {})
                     correct_answers = questions_data.get('correct_answers', {})
@@ -490,7 +949,6 @@ def main():
                     
                     if not questions:
                         st.error("Could not extract questions from the test. Please make sure it's a readable PDF.")
-                        os.unlink(tmp_path)
                     else:
                         st.success(f"✅ Extracted {len(questions)} questions from test")
                         
@@ -504,22 +962,13 @@ def main():
                             st.metric("Your Answers Found", len(user_answers) if user_answers else "No")
                         
                         # Determine wrong questions
-                        wrong_questions = []
-                        unanswered_questions = []
-                        
                         if correct_answers and user_answers:
-                            # Both answer key and user answers found - compare them
-                            for q_num_str in questions.keys():
-                                if q_num_str in correct_answers and correct_answers[q_num_str]:
-                                    if q_num_str in user_answers and user_answers[q_num_str]:
-                                        # Compare answers
-                                        if user_answers[q_num_str].upper() != correct_answers[q_num_str].upper():
-                                            wrong_questions.append(int(q_num_str))
-                                    else:
-                                        # No user answer found - assume wrong
-                                        unanswered_questions.append(int(q_num_str))
+                            # Both answer key and user answers found - compare them;
+                            # questions with no user answer are assumed wrong
+                            wrong_questions, unanswered_questions, total = grade_answers(
+                                questions, correct_answers, user_answers
+                            )
                             
-                            total = len([q for q in questions.keys() if q in correct_answers and correct_answers[q]])
                             correct_count = total - len(wrong_questions) - len(unanswered_questions)
                             
                             st.markdown("---")
@@ -545,17 +994,17 @@ def main():
                         elif correct_answers and not user_answers:
                             # Only answer key found - assume all questions wrong/need review
                             st.warning("⚠️ Answer key found but no user answers detected. Analyzing all questions.")
-                            questions_to_review = [int(q) for q in questions.keys() if q in correct_answers]
+                            questions_to_review = [int(q) for q in questions if q in correct_answers]
                         
                         elif user_answers and not correct_answers:
                             # Only user answers found - can't compare, analyze all
                             st.warning("⚠️ Your answers found but no answer key detected. Analyzing all questions.")
-                            questions_to_review = [int(q) for q in questions.keys()]
+                            questions_to_review = [int(q) for q in questions]
                         
                         else:
                             # Neither found - analyze everything
                             st.warning("⚠️ Could not detect answers or answer key. Analyzing all questions.")
-                            questions_to_review = [int(q) for q in questions.keys()]
+                            questions_to_review = [int(q) for q in questions]
                         
                         # Analyze questions
                         if questions_to_review:
@@ -565,10 +1014,14 @@ def main():
                             start_time = time.time()
                             
                             with st.spinner("Matching questions to slides in your class materials..."):
-                                result = assistant.create_targeted_study_guide(
-                                    tmp_path,
-                                    questions_to_review,
-                                    fast_mode=fast_mode
+                                result = analyze_test(
+                                    test_bytes,
+                                    tuple(questions_to_review),
+                                    fast_mode,
+                                    st.session_state.user_id,
+                                    tuple(st.session_state.processed_files),
+                                    assistant,
+                                    questions_data,
                                 )
                             
                             elapsed = time.time() - start_time
@@ -576,68 +1029,27 @@ def main():
                             # Display results - SUMMARY FIRST
                             st.success(f"✅ Analysis complete in {elapsed:.1f} seconds!")
                             
-                            # Show validation metrics
-                            if 'total_questions' in result and 'questions_mapped' in result:
-                                col1, col2, col3 = st.columns(3)
-                                with col1:
-                                    st.metric("Total Questions", result['total_questions'])
-                                with col2:
-                                    st.metric("Questions Mapped", result['questions_mapped'])
-                                with col3:
-                                    coverage = (result['questions_mapped'] / result['total_questions'] * 100) if result['total_questions'] > 0 else 0
-                                    st.metric("Coverage", f"{coverage:.0f}%")
-                            
-                            st.markdown("---")
-                            
-                            # SUMMARY SECTION
-                            if 'question_slides_map' in result:
-                                st.markdown(format_question_slide_summary(result['question_slides_map']))
-                            
-                            st.markdown("---")
-                            
-                            # DETAILED SECTION
-                            if 'question_slides_map' in result:
-                                # Detailed explanations with slide content
-                                st.markdown(format_detailed_explanations(result['question_slides_map'], questions_data))
-                                
-                            st.markdown("---")
-                            
-                            # Study guide from GPT (now in expander to reduce clutter)
-                            with st.expander("🤖 AI-Generated Study Guide (Full Text)", expanded=False):
-                                st.markdown(result.get('study_guide', 'No study guide generated'))
-                            
-                            st.markdown("---")
-
-                            # Show question-to-slide mapping - DETAILS AFTER
-                            if 'question_slides_map' in result:
-                                # Show question-by-question breakdown in expander
-                                with st.expander("📋 View by Question (which slides for each question)"):
-                                    st.markdown(format_slide_recommendations(result['question_slides_map']))
-                                
-                                # Show detailed slide content by question
-                                with st.expander("� View Detailed Slide Content"):
-                                    for q_num, slides_by_file in result['question_slides_map'].items():
-                                        st.subheader(f"Question {q_num}")
-                                        for filename, slides in slides_by_file.items():
-                                            st.markdown(f"**{filename}**")
-                                            for slide in slides:
-                                                st.markdown(f"**Slide {slide['slide_number']}:**")
-                                                st.text(slide['content'][:400] + "..." if len(slide['content']) > 400 else slide['content'])
-                                                st.markdown("---")
-                            
-                            # Show test analysis details at the very bottom
-                            with st.expander("🔍 Detailed Test Analysis (Question-by-Question)"):
-                                st.markdown(result.get('test_analysis', 'No analysis available'))
-                        
-                        # Cleanup
-                        os.unlink(tmp_path)
+                            # Kept so later reruns (expanders, other widgets) redraw it without re-analysis
+                            st.session_state.last_result = {
+                                "key": analysis_key,
+                                "result": result,
+                                "questions_data": questions_data,
+                            }
+                            render_analysis(result, questions_data)
                 
                 except Exception as e:
+                    logger.exception("Practice test analysis failed for user %s", st.session_state.user_id)
                     st.error(f"Error analyzing test: {str(e)}")
-                    import traceback
-                    st.code(traceback.format_exc())
-                    if os.path.exists(tmp_path):
-                        os.unlink(tmp_path)
+                    st.caption(f"Full details were written to {LOG_FILE}.")
+        elif last_matches:
+            st.info("Showing your last analysis of this test.")
+            if st.button("🔄 Re-read questions from the test",
+                         help="Extract the questions again instead of reusing the stored extraction"):
+                # Streamlit 1.37 can only clear the whole cache, not one test's entry
+                extract_test_questions.clear()
+                st.session_state.pop('last_result', None)
+                st.rerun()
+            render_analysis(last["result"], last["questions_data"])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,15 +1,23 @@
 import streamlit as st
+import io
 import os
-import tempfile
-import PyPDF2
+# PDF libraries and the assistant (chromadb, langchain, openai) are imported where
+# first used, so the page header renders without waiting on them
 from pathlib import Path
-from ai_study_assistant_new import AIStudyAssistant
 import uuid
-import json
+import re
+import orjson
 from datetime import datetime
 import threading
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
+from app_shared import content_digest, get_assistant, page_headed_text, pdf_pages, warm_pdf_pool
+
+logger = logging.getLogger("study_guide")
+
 # Initialize session state
 if 'user_id' not in st.session_state:
     st.session_state.user_id = str(uuid.uuid4())[:8]
@@ -17,70 +25,229 @@ if 'processed_files' not in st.session_state:
     st.session_state.processed_files = []
 if 'processed_slides' not in st.session_state:
     st.session_state.processed_slides = {}
+# Content digests of uploads already embedded this session. Kept in the session
+# only: user_id is new for every session, so each one starts with an empty
+# collection and nothing on disk would ever be read back.
+if 'ingested_hashes' not in st.session_state:
+    st.session_state.ingested_hashes = set()
+
+@st.cache_resource
+def get_save_dir():
+    """Directory of saved analyses, created once per server process."""
+    save_dir = Path("saved_results")
+    save_dir.mkdir(parents=True, exist_ok=True)
+    return save_dir
+
+@st.cache_data(ttl=5, show_spinner=False)
+def list_saved_results(save_dir):
+    """Saved analysis file names, newest first.
+    Names embed a %Y%m%d-%H%M%S stamp, so sorting by name needs no stat() calls."""
+    with os.scandir(save_dir) as entries:
+        return sorted((e.name for e in entries if e.name.endswith(".json")), reverse=True)
+
+def _write_saved_results(save_queue):
+    """Drain (path, bytes) pairs from save_queue, writing each saved analysis to disk."""
+    while True:
+        out_path, data = save_queue.get()
+        try:
+            # Written aside and swapped in, so the loader never lists a half-written file
+            tmp_out = out_path.with_name(out_path.name + ".tmp")
+            tmp_out.write_bytes(data)
+            os.replace(tmp_out, out_path)
+            list_saved_results.clear()
+        except Exception:
+            logger.exception("Could not save analysis to %s", out_path)
 
-# Initialize the AI Study Assistant with user-specific collection
 @st.cache_resource
-def get_assistant(user_id):
-    return AIStudyAssistant(persist_directory=f"db_{user_id}")
+def get_save_queue():
+    """Queue of saved-analysis writes, handled by one background thread per
+    server process so finishing an analysis never waits on the disk."""
+    save_queue = queue.Queue()
+    threading.Thread(target=_write_saved_results, args=(save_queue,), daemon=True).start()
+    return save_queue
+
+@st.cache_resource
+def start_pdf_pool_warmup():
+    """Warm a PDF worker once per server process, in the background."""
+    thread = threading.Thread(target=warm_pdf_pool, daemon=True)
+    thread.start()
+    return thread
+
+# Question numbers in the "questions to review" field
+_QNUM_RE = re.compile(r'\d+')
 
 def process_uploaded_pdf(uploaded_file, assistant):
-    """Process an uploaded PDF file and add to vector database; preserve original filename in metadata."""
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_path = tmp_file.name
-    
-    try:
-        # Extract text from PDF
-        with open(tmp_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text_content = ""
-            for page_num, page in enumerate(pdf_reader.pages):
-                text_content += f"\n\nPage {page_num + 1}\n{'-'*20}\n"
-                text_content += page.extract_text()
-        
-        # Save to temporary text file
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt', encoding='utf-8') as txt_file:
-            txt_file.write(f"Content from {uploaded_file.name}\n{'='*50}\n\n")
-            txt_file.write(text_content)
-            txt_path = txt_file.name
-        # Process with assistant, including original upload name
-        assistant.process_transcription(txt_path, original_filename=uploaded_file.name)
-        # Cleanup
-        os.unlink(tmp_path)
-        os.unlink(txt_path)
-        return True
-    except Exception as e:
-        st.error(f"Error processing PDF: {str(e)}")
-        return False
+    """Process an uploaded PDF file and add to vector database; preserve original filename in metadata.
+    Runs on upload worker threads, so errors are raised rather than shown.
+    Returns False if pages were skipped on the extraction time limit."""
+    import pdf_extract
+    text_content = page_headed_text(pdf_pages(uploaded_file))
+
+    # Process with assistant straight from memory, under the original upload name
+    assistant.process_text(
+        f"Content from {uploaded_file.name}\n{'='*50}\n\n{text_content}",
+        uploaded_file.name,
+    )
+    return pdf_extract.SKIPPED_PAGE_TEXT not in text_content
 
 def process_uploaded_pptx(uploaded_file, assistant):
-    """Process an uploaded PowerPoint file and add to vector database, preserving original filename."""
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pptx') as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_path = tmp_file.name
+    """Process an uploaded PowerPoint file and add to vector database, preserving original filename.
+    Runs on upload worker threads, so errors are raised rather than shown."""
+    # python-pptx reads the upload's in-memory stream directly
+    uploaded_file.seek(0)
+    assistant.process_pptx(uploaded_file, original_filename=uploaded_file.name)
+    return True
+
+# Uploaded files processed at the same time
+MAX_UPLOAD_WORKERS = 4
+
+def process_files(files, process_fn, assistant, label):
+    """Run process_fn over uploaded files concurrently and return the names that succeeded.
+    Files whose contents were already embedded this session are skipped; process_fn returns
+    False for a file only partly read, which is not recorded as embedded so an
+    upload of it again retries. Each file is mostly
+    waiting on disk, the OpenAI API and ChromaDB, so threads overlap well;
+    Streamlit calls stay on the script thread."""
+    progress_bar = st.progress(0)
+    succeeded = []
+    ingested = st.session_state.ingested_hashes
+    pending = {}
+    for file in files:
+        digest = content_digest(file)
+        if digest in ingested:
+            st.info(f"⏭ {file.name} (already processed)")
+        else:
+            pending[digest] = file
+    if not pending:
+        progress_bar.progress(1.0)
+        return succeeded
+
+    skipped = len(files) - len(pending)
+    with ThreadPoolExecutor(max_workers=min(MAX_UPLOAD_WORKERS, len(pending))) as executor:
+        futures = {executor.submit(process_fn, file, assistant): digest for digest, file in pending.items()}
+        for done, future in enumerate(as_completed(futures), start=skipped + 1):
+            digest = futures[future]
+            file = pending[digest]
+            try:
+                complete = future.result()
+            except Exception as e:
+                st.error(f"Error processing {label} {file.name}: {str(e)}")
+            else:
+                succeeded.append(file.name)
+                if complete:
+                    ingested.add(digest)
+                    st.success(f"✓ {file.name}")
+                else:
+                    st.warning(f"⚠ {file.name} (some pages could not be read; upload it again to retry)")
+            progress_bar.progress(done / len(files))
+    return succeeded
 
+@st.cache_data(show_spinner=False, max_entries=32)
+def estimate_analysis_seconds(test_bytes, ext):
+    """Rough analysis time for a practice test from its page or slide count.
+    Cached on the test, so analysing the same upload again skips the parse."""
     try:
-        assistant.process_pptx(tmp_path, original_filename=uploaded_file.name)
-        os.unlink(tmp_path)
-        return True
-    except Exception as e:
-        st.error(f"Error processing PowerPoint: {str(e)}")
-        return False
+        if ext == ".pdf":
+            import pdf_extract
+            if pdf_extract.fitz is not None:
+                # MuPDF reads only the page tree for this, not the pages
+                with pdf_extract.fitz.open(stream=test_bytes, filetype="pdf") as doc:
+                    pages = doc.page_count
+            else:
+                import PyPDF2
+                pages = len(PyPDF2.PdfReader(io.BytesIO(test_bytes)).pages)
+            return 20.0 + pages * 0.5
+        if ext == ".pptx":
+            from pptx import Presentation
+            return 20.0 + len(Presentation(io.BytesIO(test_bytes)).slides) * 0.2
+    except Exception:
+        pass
+    return 20.0
 
+@st.cache_data(show_spinner=False)
 def format_slide_recommendations(slides_by_file):
     """Format slide recommendations for display with emphasis on question mapping."""
-    output = "### 📊 Slides to Review (Based on Your Test Performance)\n\n"
-    output += "_The following slides cover concepts from questions you flagged or got wrong:_\n\n"
+    parts = [
+        "### 📊 Slides to Review (Based on Your Test Performance)\n\n",
+        "_The following slides cover concepts from questions you flagged or got wrong:_\n\n",
+    ]
     
     for filename, slides in slides_by_file.items():
-        output += f"**📁 {filename}**\n"
-        slide_numbers = [slide['slide_number'] for slide in slides]
-        output += f"- **Review Slides:** {', '.join(map(str, sorted(set(slide_numbers))))}\n"
-        output += f"- Total slides to review: {len(slides)}\n\n"
+        slide_numbers = sorted({slide['slide_number'] for slide in slides})
+        parts.append(f"**📁 {filename}**\n")
+        parts.append(f"- **Review Slides:** {', '.join(map(str, slide_numbers))}\n")
+        parts.append(f"- Total slides to review: {len(slides)}\n\n")
     
-    return output
+    return "".join(parts)
+
+@st.cache_data(show_spinner=False)
+def format_slide_details(slides_by_file):
+    """Markdown for every recommended slide, grouped by file, with content truncated
+    and shown verbatim in a code block. One element instead of several per slide."""
+    parts = []
+    for filename, slides in slides_by_file.items():
+        parts.append(f"### {filename}\n\n")
+        for slide in slides:
+            content = slide['content']
+            if len(content) > 400:
+                content = content[:400] + "..."
+            parts.append(f"**Slide {slide['slide_number']}:**\n```\n{content}\n```\n\n---\n\n")
+    return "".join(parts)
+
+@st.fragment(run_every=1.0)
+def analysis_progress():
+    """Estimate and elapsed time of the running analysis.
+    Ticks once a second without rerunning the page; once the analysis has
+    ended it hands over to a full rerun, which shows the result."""
+    job = st.session_state.get("pta_job")
+    if job is None:
+        return
+    if not job["thread"].is_alive():
+        st.rerun()
+    mode_label = "⚡ FAST MODE" if job["fast_mode"] else "NORMAL MODE"
+    st.info(f"{mode_label} | Estimated time: ~{job['eta_minutes']} minute(s). You can switch tabs and come back.")
+    elapsed = int(time.perf_counter() - job["t0"])
+    st.status(f"Analyzing {job['test_name']}... elapsed {elapsed // 60:02d}:{elapsed % 60:02d}")
+
+def finish_analysis(job):
+    """Store a finished analysis in the session and on disk, or report its error."""
+    total = time.perf_counter() - job["t0"]
+    if job["holder"]["error"]:
+        st.error(f"Error analyzing test: {job['holder']['error']}")
+        return
+    result = job["holder"]["result"]
+    mm = int(total // 60)
+    ss = int(total % 60)
+    st.success(f"✅ Analysis complete in {mm}m {ss}s {'⚡ (Fast Mode)' if job['fast_mode'] else ''}")
+
+    # Persist result in session so it survives navigation
+    st.session_state["pta_result"] = result
+    st.session_state["pta_test_name"] = job["test_name"]
+    st.session_state["pta_fast_mode"] = job["fast_mode"]
+    st.session_state["pta_key"] = job["key"]
+    # Save to disk for persistence across restarts
+    try:
+        save_dir = get_save_dir()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        sid = st.session_state.user_id
+        out = {
+            "test_name": job["test_name"],
+            "timestamp": stamp,
+            "session_id": sid,
+            "duration_seconds": int(total),
+            "estimate_minutes": job["eta_minutes"],
+            "fast_mode": job["fast_mode"],
+            "result": result,
+        }
+        out_path = save_dir / f"pta_{stamp}_{sid}.json"
+        # Question-number keys may be ints; stored as strings, as json did
+        get_save_queue().put((out_path, orjson.dumps(out, option=orjson.OPT_NON_STR_KEYS)))
+    except Exception as e:
+        st.warning(f"Could not save analysis: {e}")
 
 def main():
+    start_pdf_pool_warmup()
+
     st.title("AI Study Assistant 🎓")
     st.write("""Upload PowerPoint slides and practice tests to get personalized study recommendations!""")
     
@@ -91,16 +258,16 @@ def main():
         st.header("📚 Manage Content")
         # Saved analyses
         with st.expander("💾 Saved Analyses", expanded=False):
-            save_dir = Path("saved_results")
-            save_dir.mkdir(parents=True, exist_ok=True)
-            files = sorted(save_dir.glob("*.json"), reverse=True)
+            save_dir = get_save_dir()
+            files = list_saved_results(str(save_dir))
             if files:
-                sel = st.selectbox("Load a previous analysis", [f.name for f in files])
+                sel = st.selectbox("Load a previous analysis", files)
                 if st.button("Load Selected"):
                     try:
-                        data = json.loads(Path(save_dir/sel).read_text(encoding="utf-8"))
+                        data = orjson.loads((save_dir / sel).read_bytes())
                         st.session_state["pta_result"] = data.get("result")
                         st.session_state["pta_test_name"] = data.get("test_name", sel)
+                        st.session_state.pop("pta_key", None)  # not tied to the current upload
                         st.success("Loaded saved analysis.")
                     except Exception as e:
                         st.error(f"Failed to load: {e}")
@@ -119,15 +286,8 @@ def main():
             
             if pptx_files:
                 if st.button("Process PowerPoint Files"):
-                    progress_bar = st.progress(0)
-                    for i, file in enumerate(pptx_files):
-                        st.write(f"Processing {file.name}...")
-                        if process_uploaded_pptx(file, assistant):
-                            if 'pptx' not in st.session_state.processed_slides:
-                                st.session_state.processed_slides['pptx'] = []
-                            st.session_state.processed_slides['pptx'].append(file.name)
-                            st.success(f"✓ {file.name}")
-                        progress_bar.progress((i + 1) / len(pptx_files))
+                    processed = process_files(pptx_files, process_uploaded_pptx, assistant, "PowerPoint")
+                    st.session_state.processed_slides.setdefault('pptx', []).extend(processed)
                     st.success("All PowerPoint files processed!")
         
         # PDF upload section
@@ -142,13 +302,8 @@ def main():
             
             if pdf_files:
                 if st.button("Process PDF Files"):
-                    progress_bar = st.progress(0)
-                    for i, file in enumerate(pdf_files):
-                        st.write(f"Processing {file.name}...")
-                        if process_uploaded_pdf(file, assistant):
-                            st.session_state.processed_files.append(file.name)
-                            st.success(f"✓ {file.name}")
-                        progress_bar.progress((i + 1) / len(pdf_files))
+                    processed = process_files(pdf_files, process_uploaded_pdf, assistant, "PDF")
+                    st.session_state.processed_files.extend(processed)
                     st.success("All PDF files processed!")
         
         # Show processed files
@@ -204,141 +359,83 @@ def main():
             help="Faster processing with slightly less detail (~30-40% quicker)"
         )
         
-        if practice_test and st.button("Analyze Test & Generate Study Guide"):
+        analyze_clicked = practice_test and st.button("Analyze Test & Generate Study Guide")
+        # Reruns and repeat clicks with unchanged inputs reuse the stored analysis.
+        # Keyed on the test's contents and the materials embedded so far: a
+        # different file under the same name, or newly added slides, reanalyse.
+        analysis_key = (
+            content_digest(practice_test),
+            flagged_input.strip(),
+            fast_mode,
+            tuple(st.session_state.processed_slides.get('pptx', [])),
+            tuple(st.session_state.processed_files),
+        ) if practice_test else None
+        same_inputs = analysis_key is not None and st.session_state.get("pta_key") == analysis_key
+        job = st.session_state.get("pta_job")
+        # One analysis per session at a time; clicks while it runs are ignored
+        run_analysis = analyze_clicked and not same_inputs and job is None
+        if run_analysis:
             # Parse flagged questions
             flagged_questions = None
             if flagged_input.strip():
-                try:
-                    flagged_questions = [int(q.strip()) for q in flagged_input.split(',')]
-                except:
-                    st.warning("Could not parse question numbers. Analyzing all questions.")
+                # Any separators are accepted ("1, 3; 5 7"); duplicates are dropped, order kept
+                numbers = _QNUM_RE.findall(flagged_input)
+                if not numbers:
+                    st.error("Could not find any question numbers. Enter them like: 1, 5, 12")
+                    st.stop()
+                flagged_questions = list(dict.fromkeys(map(int, numbers)))
             
-            # Save practice test temporarily with matching extension
+            # The test is analysed straight from the upload's bytes; no temp file
             ext = os.path.splitext(practice_test.name)[1].lower()
             if ext not in [".pdf", ".pptx"]:
                 st.error("Unsupported file type. Please upload a PDF or PPTX.")
                 return
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp_file:
-                tmp_file.write(practice_test.getvalue())
-                tmp_path = tmp_file.name
+            test_bytes = practice_test.getvalue()
             
             try:
                 # Estimate time before starting
-                est_seconds = 20.0
-                if ext == ".pdf":
-                    try:
-                        pages = len(PyPDF2.PdfReader(tmp_path).pages)
-                        est_seconds = 20.0 + pages * 0.5
-                    except Exception:
-                        pass
-                elif ext == ".pptx":
-                    try:
-                        # Lazy import to avoid dependency error if not installed
-                        from pptx import Presentation  # type: ignore
-                        slides = len(Presentation(tmp_path).slides)
-                        est_seconds = 20.0 + slides * 0.2
-                    except Exception:
-                        pass
+                est_seconds = estimate_analysis_seconds(test_bytes, ext)
 
                 eta_minutes = max(1, int(round(est_seconds / 60.0)))
                 if fast_mode:
                     eta_minutes = max(1, int(eta_minutes * 0.65))  # Fast mode ~35% faster
-                
-                mode_label = "⚡ FAST MODE" if fast_mode else "NORMAL MODE"
-                st.info(f"{mode_label} | Estimated time: ~{eta_minutes} minute(s). You can switch tabs and come back.")
 
-                # Run analysis in a background thread, show live elapsed timer
+                # Run analysis in a background thread; the job lives in the session,
+                # so reruns while it works (or switching tools) don't lose it
                 result_holder = {"result": None, "error": None}
                 def _run():
                     try:
-                        result_holder["result"] = assistant.create_targeted_study_guide(tmp_path, flagged_questions, fast_mode=fast_mode)
+                        result_holder["result"] = assistant.create_targeted_study_guide(
+                            test_bytes, flagged_questions, fast_mode=fast_mode, file_type=ext
+                        )
                     except Exception as e:
                         result_holder["error"] = str(e)
 
                 t0 = time.perf_counter()
                 th = threading.Thread(target=_run, daemon=True)
                 th.start()
-
-                timer_placeholder = st.empty()
-                status_placeholder = st.empty()
-                while th.is_alive():
-                    elapsed = time.perf_counter() - t0
-                    mm = int(elapsed // 60)
-                    ss = int(elapsed % 60)
-                    timer_placeholder.info(f"Elapsed: {mm:02d}:{ss:02d}")
-                    time.sleep(0.5)
-                th.join()
-
-                total = time.perf_counter() - t0
-                mm = int(total // 60)
-                ss = int(total % 60)
-
-                if result_holder["error"]:
-                    raise RuntimeError(result_holder["error"]) 
-
-                result = result_holder["result"]
-                status_placeholder.success(f"✅ Analysis complete in {mm}m {ss}s {'⚡ (Fast Mode)' if fast_mode else ''}")
-
-                # Persist result in session so it survives navigation
-                st.session_state["pta_result"] = result
-                st.session_state["pta_test_name"] = practice_test.name
-                st.session_state["pta_fast_mode"] = fast_mode
-                # Save to disk for persistence across restarts
-                try:
-                    save_dir = Path("saved_results")
-                    save_dir.mkdir(parents=True, exist_ok=True)
-                    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-                    sid = st.session_state.user_id
-                    out = {
-                        "test_name": practice_test.name,
-                        "timestamp": stamp,
-                        "session_id": sid,
-                        "duration_seconds": int(total),
-                        "estimate_minutes": eta_minutes,
-                        "fast_mode": fast_mode,
-                        "result": result,
-                    }
-                    out_path = save_dir / f"pta_{stamp}_{sid}.json"
-                    out_path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
-                except Exception as e:
-                    st.warning(f"Could not save analysis: {e}")
-                
-                # Display results
-                st.success("✅ Analysis complete!")
-                
-                # Show slide recommendations prominently
-                st.markdown("---")
-                st.header("🎯 Recommended Slides to Review")
-                st.markdown(format_slide_recommendations(result['slides_to_review']))
-                
-                # Show detailed slide content
-                with st.expander("📋 View Full Slide Details"):
-                    for filename, slides in result['slides_to_review'].items():
-                        st.subheader(filename)
-                        for slide in slides:
-                            st.markdown(f"**Slide {slide['slide_number']}:**")
-                            st.text(slide['content'][:400] + "..." if len(slide['content']) > 400 else slide['content'])
-                            st.markdown("---")
-                
-                # Show test analysis
-                with st.expander("🔍 Test Analysis"):
-                    st.markdown(result['test_analysis'])
-                
-                # Show study guide with explicit question-to-slide mapping
-                st.markdown("---")
-                st.header("📖 Your Personalized Study Guide")
-                st.info("💡 This guide connects each question to specific slides you should review")
-                st.markdown(result['study_guide'])
-                
-                # Cleanup
-                os.unlink(tmp_path)
-                
+                job = st.session_state["pta_job"] = {
+                    "thread": th,
+                    "holder": result_holder,
+                    "t0": t0,
+                    "key": analysis_key,
+                    "test_name": practice_test.name,
+                    "fast_mode": fast_mode,
+                    "eta_minutes": eta_minutes,
+                }
             except Exception as e:
                 st.error(f"Error analyzing test: {str(e)}")
-                os.unlink(tmp_path)
+
+        if job is not None:
+            if job["thread"].is_alive():
+                analysis_progress()
+            else:
+                del st.session_state["pta_job"]
+                finish_analysis(job)
+                same_inputs = analysis_key is not None and st.session_state.get("pta_key") == analysis_key
 
         # If there is a previous analysis saved in session, offer to show it
-        if not practice_test and st.session_state.get("pta_result"):
+        if "pta_job" not in st.session_state and st.session_state.get("pta_result") and (not practice_test or same_inputs):
             mode_indicator = " ⚡ (Fast Mode)" if st.session_state.get("pta_fast_mode") else ""
             st.info(f"Showing last analysis for: {st.session_state.get('pta_test_name','(unknown)')}{mode_indicator}")
             result = st.session_state["pta_result"]
@@ -349,12 +446,7 @@ def main():
             st.markdown(format_slide_recommendations(result['slides_to_review']))
             
             with st.expander("📋 View Full Slide Details"):
-                for filename, slides in result['slides_to_review'].items():
-                    st.subheader(filename)
-                    for slide in slides:
-                        st.markdown(f"**Slide {slide['slide_number']}:**")
-                        st.text(slide['content'][:400] + "..." if len(slide['content']) > 400 else slide['content'])
-                        st.markdown("---")
+                st.markdown(format_slide_details(result['slides_to_review']))
             with st.expander("🔍 Test Analysis"):
                 st.markdown(result['test_analysis'])
             st.markdown("---")
@@ -372,9 +464,11 @@ def main():
         
     elif tool == "❓ Ask Questions":
         st.header("Ask Questions About Course Content")
-        query = st.text_input("Enter your question:")
+        with st.form("ask_form"):
+            query = st.text_input("Enter your question:")
+            submitted = st.form_submit_button("Ask")
         
-        if query:
+        if submitted and query:
             with st.spinner("Searching and generating response..."):
                 result = assistant.query_knowledge_base(query)
                 
@@ -392,27 +486,33 @@ def main():
                 
     elif tool == "📝 Generate Quiz":
         st.header("Generate Practice Quiz")
-        topic = st.text_input("Enter the topic for the quiz:")
+        with st.form("quiz_form"):
+            topic = st.text_input("Enter the topic for the quiz:")
+            submitted = st.form_submit_button("Generate Quiz")
         
-        if topic:
+        if submitted and topic:
             with st.spinner("Generating quiz..."):
                 quiz = assistant.generate_quiz(topic)
                 st.markdown(quiz)
                 
     elif tool == "📚 Create Study Guide":
         st.header("Create Focused Study Guide")
-        topic = st.text_input("Enter the topic for the study guide:")
+        with st.form("study_guide_form"):
+            topic = st.text_input("Enter the topic for the study guide:")
+            submitted = st.form_submit_button("Create Study Guide")
         
-        if topic:
+        if submitted and topic:
             with st.spinner("Creating study guide..."):
                 guide = assistant.create_study_guide(topic)
                 st.markdown(guide)
                 
     elif tool == "🗺️ Concept Map":
         st.header("Generate Concept Map")
-        topic = st.text_input("Enter the topic to map:")
+        with st.form("concept_map_form"):
+            topic = st.text_input("Enter the topic to map:")
+            submitted = st.form_submit_button("Generate Concept Map")
         
-        if topic:
+        if submitted and topic:
             with st.spinner("Generating concept map..."):
                 concept_map = assistant.concept_map(topic)
                 st.code(concept_map)
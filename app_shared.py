@@ -0,0 +1,154 @@
+"""Process-wide resources shared by app_enhanced and app_practice_test.
+
+Both Streamlit apps import these rather than keeping their own copies, so the
+storage layout and caches stay the same whichever app a user opens.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import orjson
+import streamlit as st
+
+logger = logging.getLogger("study_guide")
+
+# ChromaDB store shared by every user; each user gets a collection in it
+SHARED_DB_DIR = "db_shared"
+
+@st.cache_resource
+def get_chroma_client():
+    """One ChromaDB client per server process, so users share a single backend.
+    With CHROMA_HOST set, that backend is a Chroma server (`chroma run`) shared by
+    every app process, and the indexes live in its memory rather than ours."""
+    import chromadb
+    host = os.getenv("CHROMA_HOST")
+    if host:
+        return chromadb.HttpClient(host=host, port=int(os.getenv("CHROMA_PORT", "8000")))
+    return chromadb.PersistentClient(path=SHARED_DB_DIR)
+
+def _usable_cpus():
+    """CPUs this process may run on; os.cpu_count() reports the whole host."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS or Windows
+        return os.cpu_count() or 1
+
+# Worker processes for extracting large PDFs, shared by all sessions. Capped:
+# each one imports PyMuPDF, and containers often see far more CPUs than they get.
+PDF_WORKERS = min(_usable_cpus(), 4)
+
+@st.cache_resource
+def get_pdf_pool():
+    """Process pool for page-parallel PDF extraction.
+    Spawned rather than forked: the Streamlit server process is multi-threaded."""
+    return ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+def warm_pdf_pool():
+    """Start one PDF worker and load PyMuPDF in it ahead of the first upload.
+    The rest of the pool is spawned on demand, so servers that never see a PDF
+    pay for a single process. Blocks until it is up; failures are logged, not raised."""
+    try:
+        import pdf_extract
+        get_pdf_pool().submit(pdf_extract.warm_up).result()
+    except Exception:
+        logger.exception("Could not warm the PDF worker pool")
+
+# Separator line written under each page header of extracted PDF text
+PAGE_SEPARATOR = '-' * 20
+
+def page_headed_text(pages):
+    """Join per-page texts under "Page N" headers, the layout both apps store."""
+    parts = []
+    for page_num, text in enumerate(pages):
+        parts.append(f"\n\nPage {page_num + 1}\n{PAGE_SEPARATOR}\n")
+        parts.append(text)
+    return "".join(parts)
+
+def pool_pdf_pages(data: bytes):
+    """Text of each page of a PDF via PyMuPDF on the shared worker pool.
+    A worker that died (e.g. killed for memory) breaks the whole pool, so the
+    pool is rebuilt and the file tried once more. Requires PyMuPDF."""
+    import pdf_extract
+    try:
+        return pdf_extract.extract_pages(data, executor=get_pdf_pool())
+    except BrokenProcessPool:
+        logger.warning("PDF worker pool broke; starting a new one")
+        get_pdf_pool.clear()
+        return pdf_extract.extract_pages(data, executor=get_pdf_pool())
+
+def pymupdf_pages(uploaded_file):
+    """Text of each page of a PDF upload via PyMuPDF on the shared worker pool.
+    Requires PyMuPDF; raises if it rejects the file."""
+    # MuPDF needs its own bytes object; this is the only copy of the upload
+    return pool_pdf_pages(uploaded_file.getvalue())
+
+def pypdf2_pages(uploaded_file):
+    """Text of each page of a PDF upload via PyPDF2, read from the upload's own stream."""
+    import PyPDF2
+    uploaded_file.seek(0)
+    return [page.extract_text() or "" for page in PyPDF2.PdfReader(uploaded_file).pages]
+
+def pdf_pages(uploaded_file):
+    """Text of each page of a PDF upload: PyMuPDF when it is installed and can
+    read the file, otherwise PyPDF2, which is more lenient with some files."""
+    import pdf_extract
+    if pdf_extract.fitz is not None:
+        try:
+            return pymupdf_pages(uploaded_file)
+        except Exception:
+            logger.warning("PyMuPDF could not read %s; falling back to PyPDF2", uploaded_file.name)
+    return pypdf2_pages(uploaded_file)
+
+def has_legacy_db(user_id):
+    """Whether the user's material lives in a ChromaDB store of their own from before SHARED_DB_DIR."""
+    return os.path.exists(os.path.join(f"db_{user_id}", "chroma.sqlite3"))
+
+# Initialize the AI Study Assistant with user-specific collection.
+# Bounded so assistants of users who have gone away are evicted; call
+# get_assistant.clear() to force every user onto a fresh instance.
+@st.cache_resource(max_entries=32)
+def get_assistant(user_id):
+    from ai_study_assistant_new import AIStudyAssistant
+    if has_legacy_db(user_id):
+        assistant = AIStudyAssistant(persist_directory=f"db_{user_id}")
+    else:
+        assistant = AIStudyAssistant(client=get_chroma_client(), collection_name=f"user_{user_id}")
+    # Practice tests read by the assistant are split across the same pool as uploads
+    assistant.pdf_pages = pool_pdf_pages
+    return assistant
+
+def get_ingested_path(user_id):
+    """Get path to the record of file hashes already embedded in the user's DB."""
+    return os.path.join(f"db_{user_id}", "_ingested.json")
+
+# Upload fingerprints are BLAKE2b digests of this many bytes (hex strings twice as long)
+CONTENT_DIGEST_SIZE = 16
+
+def load_ingested_hashes(user_id):
+    """Load the set of content digests of files already in the user's DB.
+    Entries from the older SHA-256 format never match a current digest and are dropped."""
+    file_path = get_ingested_path(user_id)
+    if os.path.exists(file_path):
+        with open(file_path, 'rb') as f:
+            return {h for h in orjson.loads(f.read()) if len(h) == CONTENT_DIGEST_SIZE * 2}
+    return set()
+
+def save_ingested_hashes(user_id, hashes):
+    """Save the set of ingested file hashes next to the user's DB.
+    Written to a temp file and swapped in, so a crash never leaves a truncated record."""
+    file_path = get_ingested_path(user_id)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(sorted(hashes)))
+    os.replace(tmp_path, file_path)
+
+def content_digest(uploaded_file):
+    """BLAKE2b fingerprint of an uploaded file's contents.
+    An unmodified upload's getvalue() returns the bytes it already holds, so this
+    hashes them without a copy; file_digest() and getbuffer() both make the
+    BytesIO copy its shared buffer first."""
+    return hashlib.blake2b(uploaded_file.getvalue(), digest_size=CONTENT_DIGEST_SIZE).hexdigest()
@@ -0,0 +1,77 @@
+"""PDF text extraction that can be spread over worker processes.
+
+The functions live in their own module so ProcessPoolExecutor can pickle
+them by reference; a Streamlit script is not importable from a worker.
+"""
+import contextlib
+import logging
+import os
+import tempfile
+from concurrent.futures import TimeoutError, wait
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# Seconds a page may take once a worker has it before it is skipped instead of
+# waited on. Graphics-heavy pages can take minutes for a few hundred characters.
+PAGE_TIMEOUT = 5.0
+# How often to check whether a queued page has been handed to a worker yet
+QUEUE_POLL = 0.05
+SKIPPED_PAGE_TEXT = "[page skipped: extraction timeout]"
+
+logger = logging.getLogger("study_guide.pdf_extract")
+
+def warm_up() -> bool:
+    """No-op pool task. Running one per worker starts the worker processes and
+    imports PyMuPDF in each, so the first real extraction pays for neither."""
+    return fitz is not None
+
+def extract_page(path: str, index: int) -> str:
+    """Text of one page of the PDF file at path."""
+    with fitz.open(path) as doc:
+        return doc[index].get_text("text")
+
+def _page_result(future) -> str:
+    """A page task's text, or SKIPPED_PAGE_TEXT if it ran past PAGE_TIMEOUT.
+
+    The clock starts when the pool hands the task to its workers, not at submit,
+    so pages queued behind other uploads are not cut short. MuPDF cannot be
+    interrupted, so a skipped page keeps its worker busy until it finishes;
+    only its text is given up on.
+    """
+    while not (future.running() or future.done()):
+        wait([future], timeout=QUEUE_POLL)
+    try:
+        return future.result(timeout=PAGE_TIMEOUT)
+    except TimeoutError:
+        return SKIPPED_PAGE_TEXT
+
+def extract_pages(data: bytes, executor=None) -> list[str]:
+    """Text of every page of a PDF, in page order.
+
+    With an executor, every page is its own task, so pages parse in parallel
+    and a page that overruns PAGE_TIMEOUT is skipped on its own (see
+    _page_result). The PDF is written to a temp file once and workers are sent
+    its path, not a pickled copy of the bytes each. Without an executor pages
+    are read in this process, with no time limit. Requires PyMuPDF.
+    """
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        page_count = doc.page_count
+        if executor is None:
+            return [page.get_text("text") for page in doc]
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(data)
+    try:
+        futures = [executor.submit(extract_page, tmp.name, i) for i in range(page_count)]
+        pages = [_page_result(future) for future in futures]
+    finally:
+        # A skipped page's worker may still have the file open, which Windows refuses
+        with contextlib.suppress(OSError):
+            os.unlink(tmp.name)
+    skipped = pages.count(SKIPPED_PAGE_TEXT)
+    if skipped:
+        logger.warning("Skipped %d of %d pages that ran past the extraction time limit", skipped, page_count)
+    return pages